@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import requests
+
+KERNEL_SCRIPTS_URL = "https://raw.githubusercontent.com/torvalds/linux/master/scripts"
+
+# Local file -> permission bits to apply after download
+DEPENDENCIES = {
+    "checkpatch.pl": 0o755,
+    "spelling.txt": None,
+}
+
+
+def _meta_path(local_path: Path) -> Path:
+    return local_path.with_name(local_path.name + ".meta.json")
+
+
+def fetch_if_changed(session: requests.Session, url: str, local_path: str, mode=None) -> bool:
+    """Download url to local_path unless the server reports our copy is current.
+
+    Files we fetched keep their ETag/Last-Modified in a .meta.json sidecar so
+    later runs only pay for a conditional GET. A file present without a
+    sidecar was provided locally and is left untouched. Returns True if the
+    file was written.
+    """
+    local = Path(local_path)
+    meta_file = _meta_path(local)
+    headers = {}
+    if local.exists():
+        if not meta_file.exists():
+            return False
+        meta = json.loads(meta_file.read_text())
+        if meta.get("etag"):
+            headers["If-None-Match"] = meta["etag"]
+        if meta.get("last_modified"):
+            headers["If-Modified-Since"] = meta["last_modified"]
+
+    try:
+        with session.get(url, headers=headers, stream=True, timeout=30) as response:
+            if response.status_code == 304:
+                return False
+            response.raise_for_status()
+            print(f"Downloading {local.name}...")
+            partial = local.with_name(local.name + ".part")
+            with open(partial, "wb") as f:
+                for chunk in response.iter_content(chunk_size=64 * 1024):
+                    f.write(chunk)
+            os.replace(partial, local)
+            meta_file.write_text(json.dumps({
+                "etag": response.headers.get("ETag"),
+                "last_modified": response.headers.get("Last-Modified"),
+            }))
+    except requests.RequestException as e:
+        if not local.exists():
+            raise
+        print(f"Could not refresh {local.name}, keeping local copy: {e}")
+        return False
+
+    if mode is not None:
+        os.chmod(local, mode)
+    return True
+
+
+def ensure_dependencies(names=None):
+    """Download required tools if not present, refreshing ones we downloaded before.
+
+    names limits the fetch to those entries of DEPENDENCIES; by default all
+    of them are fetched.
+    """
+    wanted = {name: DEPENDENCIES[name] for name in (names or DEPENDENCIES)}
+    with requests.Session() as session, ThreadPoolExecutor(max_workers=len(wanted)) as executor:
+        futures = [
+            executor.submit(fetch_if_changed, session, f"{KERNEL_SCRIPTS_URL}/{name}", name, mode)
+            for name, mode in wanted.items()
+        ]
+        for future in futures:
+            future.result()
+
+
+if __name__ == "__main__":
+    ensure_dependencies()
@@ -1,14 +1,58 @@
 #!/usr/bin/env python3
 
 import requests
-import json
+import urllib3
+import io
 import os
-import urllib.request
+import re
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from pathlib import Path
 from scoring_analytics_engine import ScoringEngine
+from dependency_fetcher import ensure_dependencies
+from json_utils import dump_json, extract_chat_content
 
+# Shared across calls and threads so each generation reuses a pooled connection
+_SESSION = requests.Session()
+_SESSION.mount("http://", requests.adapters.HTTPAdapter(pool_maxsize=16))
 
-def ask_ollama_stream(query, model="qwen2.5:latest", system_prompt=None):
+def _iter_raw_lines(response, chunk_size=64 * 1024):
+    """Yield NDJSON lines as bytes, splitting the raw stream ourselves.
+
+    read1() returns whatever has arrived; read(n) would wait for n bytes
+    and hold back tokens on a slow stream.
+    """
+    raw = response.raw
+    read1 = getattr(raw, "read1", None)
+    if read1 is None:
+        yield from response.iter_lines()
+        return
+    raw.decode_content = True
+    pending = b""
+    while True:
+        # Reading raw skips requests' wrapping, so map urllib3 errors the way
+        # iter_content does and callers can keep catching RequestException
+        try:
+            data = read1(chunk_size)
+        except urllib3.exceptions.ProtocolError as e:
+            raise requests.exceptions.ChunkedEncodingError(e)
+        except urllib3.exceptions.DecodeError as e:
+            raise requests.exceptions.ContentDecodingError(e)
+        except urllib3.exceptions.ReadTimeoutError as e:
+            raise requests.exceptions.ConnectionError(e)
+        except urllib3.exceptions.SSLError as e:
+            raise requests.exceptions.SSLError(e)
+        if not data:
+            break
+        lines = (pending + data).split(b"\n")
+        pending = lines.pop()
+        yield from lines
+    if pending:
+        yield pending
+
+
+def ask_ollama_stream(query, model="qwen2.5:latest", system_prompt=None, out_path=None):
+    """Stream a chat completion; chunks are also written to out_path as they arrive"""
     ollama_host = os.getenv('OLLAMA_HOST', 'localhost')
     url = f"http://{ollama_host}:11434/api/chat"
     messages = []
@@ -22,39 +66,34 @@ def ask_ollama_stream(query, model="qwen2.5:latest", system_prompt=None):
         "stream": True
     }
     
-    buffer = []
+    buffer = io.StringIO()
+    sink = open(out_path, "w") if out_path else None
     try:
-        with requests.post(url, json=payload, stream=True) as response:
+        with _SESSION.post(url, json=payload, stream=True) as response:
             response.raise_for_status()
-            for line in response.iter_lines():
+            for line in _iter_raw_lines(response):
                 if line:
-                    data = line.decode("utf-8")
-                    chunk = json.loads(data)
-                    content = chunk.get("message", {}).get("content")
+                    content = extract_chat_content(line)
                     if content:
-                        buffer.append(content)
-        return "".join(buffer)
+                        buffer.write(content)
+                        if sink:
+                            sink.write(content)
+        result = buffer.getvalue()
     except requests.RequestException as e:
-        return f"Error communicating with Ollama: {e}"
-
-
-def ensure_dependencies():
-    """Download required tools if not present"""
-    checkpatch_url = "https://raw.githubusercontent.com/torvalds/linux/master/scripts/checkpatch.pl"
-    spelling_url = "https://raw.githubusercontent.com/torvalds/linux/master/scripts/spelling.txt"
-    
-    if not Path("checkpatch.pl").exists():
-        print("Downloading checkpatch.pl...")
-        urllib.request.urlretrieve(checkpatch_url, "checkpatch.pl")
-        os.chmod("checkpatch.pl", 0o755)
-    
-    if not Path("spelling.txt").exists():
-        print("Downloading spelling.txt...")
-        urllib.request.urlretrieve(spelling_url, "spelling.txt")
+        result = f"Error communicating with Ollama: {e}"
+        if sink:
+            sink.seek(0)
+            sink.truncate()
+            sink.write(result)
+    finally:
+        if sink:
+            sink.close()
+    return result
 
 
+@lru_cache(maxsize=1)
 def load_kernel_standards():
-    """Load kernel coding standards or create default"""
+    """Load kernel coding standards or create default; read once per process"""
     standards_file = "kernel_standards.txt"
     
     if Path(standards_file).exists():
@@ -107,8 +146,8 @@ You are an expert Linux kernel developer. Follow these guidelines:
 
 
 def generate_test_prompts():
-    """Generate various test prompts for driver evaluation"""
-    return [
+    """Generate various test prompts for driver evaluation, keyed by name"""
+    prompts = [
         {
             "name": "simple_char_driver",
             "prompt": """
@@ -141,18 +180,32 @@ Follow the Linux kernel coding style strictly.
             "expected_features": ["proc_create", "file_operations", "seq_file"]
         }
     ]
+    return {t["name"]: t for t in prompts}
 
 
-def run_enhanced_evaluation(model="qwen2.5:latest", test_name="simple_char_driver"):
-    """Run enhanced evaluation with detailed scoring"""
-    
+def _prepare_environment(test_name="simple_char_driver"):
+    """One-time setup shared by every model: tools, standards and the test prompt"""
     ensure_dependencies()
     kernel_standards = load_kernel_standards()
     test_prompts = generate_test_prompts()
     
-    # Find the test prompt
-    test_prompt = next((t for t in test_prompts if t["name"] == test_name), test_prompts[0])
+    # Find the test prompt, falling back to the first one
+    test_prompt = test_prompts.get(test_name) or next(iter(test_prompts.values()))
+    return kernel_standards, test_prompt
+
+
+def _model_file_suffix(model):
+    return "_" + re.sub(r"[^\w.-]", "_", model)
 
+
+def _print_generation_header(model, test_prompt):
+    print(f"Generating code for: {test_prompt['name']}")
+    print(f"Using model: {model}")
+    print("-" * 60)
+
+
+def _generate_for_model(model, kernel_standards, test_prompt, file_suffix=""):
+    """Generate and save code for one model without printing; returns (output_file, code)"""
     direction = """Return only the code, no other text. No backticks. Just the simple executable code.
                     Follow the linux kernel coding style.
                     Use the latest linux kernel version.
@@ -160,24 +213,40 @@ def run_enhanced_evaluation(model="qwen2.5:latest", test_name="simple_char_drive
                     No backticks (```c``) either. Just directly executable code.
                     """
     
-    print(f"Generating code for: {test_prompt['name']}")
-    print(f"Using model: {model}")
-    print("-" * 60)
-    
-    # Generate code
-    result = ask_ollama_stream(test_prompt["prompt"]+direction, model, kernel_standards)
+    # Generate code, streaming it straight into the output file
+    output_file = f"results/generated_{test_prompt['name']}{file_suffix}.c"
+    result = ask_ollama_stream(test_prompt["prompt"]+direction, model, kernel_standards,
+                               out_path=output_file)
+    return output_file, result
+
+
+def _score_generated_code(scoring_engine, output_file, test_prompt, file_suffix="",
+                          checkpatch_violations=None, code=None):
+    """Score a generated file and export the detailed results; returns (evaluation_result, results_file)"""
+    evaluation_result = scoring_engine.evaluate_driver_code(
+        output_file, checkpatch_violations=checkpatch_violations, code=code
+    )
     
-    # Save generated code
-    output_file = f"results/generated_{test_prompt['name']}.c"
-    with open(output_file, "w") as f:
-        f.write(result)
+    # Save detailed results
+    results_file = f"results/detailed_results_{test_prompt['name']}{file_suffix}.json"
+    scoring_engine.export_results(evaluation_result, results_file)
     
+    return evaluation_result, results_file
+
+
+def _evaluate_for_model(model, kernel_standards, test_prompt, scoring_engine, file_suffix=""):
+    """Generate, save and score code for one model; returns (evaluation_result, code)"""
+    _print_generation_header(model, test_prompt)
+    output_file, code = _generate_for_model(model, kernel_standards, test_prompt, file_suffix)
     print(f"Code saved to: {output_file}")
-    
-    # Run enhanced evaluation
-    scoring_engine = ScoringEngine()
-    evaluation_result = scoring_engine.evaluate_driver_code(output_file)
-    
+    evaluation_result, results_file = _score_generated_code(scoring_engine, output_file, test_prompt,
+                                                            file_suffix, code=code)
+    print(f"Detailed results saved to: {results_file}")
+    return evaluation_result, code
+
+
+def _print_evaluation_result(evaluation_result, code, test_prompt):
+    """Print the detailed report for one evaluation"""
     # Print detailed results
     print("\n" + "="*60)
     print("ENHANCED EVALUATION RESULTS")
@@ -242,15 +311,18 @@ def run_enhanced_evaluation(model="qwen2.5:latest", test_name="simple_char_drive
     
     # Feature Analysis
     print("FEATURE ANALYSIS:")
-    code = result.lower()
+    code = code.lower()
     for feature in test_prompt["expected_features"]:
         found = feature.lower() in code
         print(f"  {feature}: {'✓' if found else '✗'}")
+
+
+def run_enhanced_evaluation(model="qwen2.5:latest", test_name="simple_char_driver"):
+    """Run enhanced evaluation with detailed scoring"""
     
-    # Save detailed results
-    results_file = f"results/detailed_results_{test_prompt['name']}.json"
-    scoring_engine.export_results(evaluation_result, results_file)
-    print(f"\nDetailed results saved to: {results_file}")
+    kernel_standards, test_prompt = _prepare_environment(test_name)
+    evaluation_result, code = _evaluate_for_model(model, kernel_standards, test_prompt, ScoringEngine())
+    _print_evaluation_result(evaluation_result, code, test_prompt)
     
     return evaluation_result
 
@@ -261,22 +333,54 @@ def compare_models(models=["qwen2.5:latest"], test_name="simple_char_driver"):
     print("MULTI-MODEL COMPARISON")
     print("="*60)
     
-    results = []
+    # Shared setup runs once; model generations overlap on the pool
+    kernel_standards, test_prompt = _prepare_environment(test_name)
+    scoring_engine = ScoringEngine()
     
-    for model in models:
-        print(f"\nEvaluating model: {model}")
-        try:
-            result = run_enhanced_evaluation(model, test_name)
-            results.append((model, result))
-        except Exception as e:
-            print(f"Error evaluating {model}: {e}")
+    with ThreadPoolExecutor(max_workers=min(len(models), os.cpu_count() or 1)) as executor:
+        generation_futures = [
+            (model, executor.submit(_generate_for_model, model, kernel_standards, test_prompt,
+                                    _model_file_suffix(model)))
+            for model in models
+        ]
+        # Workers stay silent; progress is printed here in submission order
+        generated = {}
+        for model, future in generation_futures:
+            _print_generation_header(model, test_prompt)
+            try:
+                generated[model] = future.result()
+            except Exception as e:
+                print(f"Error evaluating {model}: {e}")
+                continue
+            print(f"Code saved to: {generated[model][0]}")
+    
+        # One checkpatch.pl process for every generated file
+        checkpatch_counts = scoring_engine.static_analyzer.run_checkpatch_batch(
+            [output_file for output_file, _ in generated.values()]
+        )
+        scoring_futures = [
+            (model, executor.submit(_score_generated_code, scoring_engine, output_file, test_prompt,
+                                    _model_file_suffix(model), checkpatch_counts[output_file], code))
+            for model, (output_file, code) in generated.items()
+        ]
+    
+        results = []
+        for model, future in scoring_futures:
+            print(f"\nEvaluating model: {model}")
+            try:
+                evaluation_result, results_file = future.result()
+            except Exception as e:
+                print(f"Error evaluating {model}: {e}")
+                continue
+            print(f"Detailed results saved to: {results_file}")
+            _print_evaluation_result(evaluation_result, generated[model][1], test_prompt)
+            results.append((model, evaluation_result))
     
     if len(results) < 2:
         print("Need at least 2 successful evaluations for comparison")
         return
     
     # Generate comparison
-    scoring_engine = ScoringEngine()
     comparison = scoring_engine.compare_models(results)
     
     print("\n" + "="*60)
@@ -296,8 +400,7 @@ def compare_models(models=["qwen2.5:latest"], test_name="simple_char_driver"):
         print(f"  {category.title()}: {winner}")
     
     # Save comparison results
-    with open(f"model_comparison_{test_name}.json", "w") as f:
-        json.dump(comparison, f, indent=2)
+    dump_json(comparison, f"model_comparison_{test_name}.json")
 
 
 def main():
@@ -305,7 +408,7 @@ def main():
     
     parser = argparse.ArgumentParser(description="Enhanced Linux Driver Code Evaluation")
     parser.add_argument("--model", default="qwen2.5:latest", help="Ollama model to use")
-    parser.add_argument("--test", choices=["simple_char_driver", "gpio_platform_driver", "proc_interface_driver"],
+    parser.add_argument("--test", choices=list(generate_test_prompts()),
                        default="simple_char_driver", help="Test type to run")
     parser.add_argument("--compare", nargs="+", help="Compare multiple models")
     
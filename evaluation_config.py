@@ -1,7 +1,11 @@
 import json
-from dataclasses import dataclass, asdict
+import re
+from dataclasses import dataclass
+from types import MappingProxyType
 from typing import Dict, List, Optional
 
+from json_utils import dump_json
+
 
 @dataclass
 class ScoringWeights:
@@ -60,8 +64,7 @@ class EvaluationConfig:
         )
     
     def save_to_file(self, config_path: str):
-        with open(config_path, 'w') as f:
-            json.dump(asdict(self), f, indent=2)
+        dump_json(self, config_path)
 
 
 # Default test configurations
@@ -249,6 +252,31 @@ SECURITY_PATTERNS = {
 }
 
 
+def _compile_rule_patterns(rule_sets: Dict[str, List[Dict]]):
+    """Attach a compiled pattern to every rule so consumers never re-parse one"""
+    for rules in rule_sets.values():
+        for rule in rules:
+            rule['compiled'] = re.compile(rule['pattern'])
+
+
+def _freeze(value):
+    """Recursively turn dicts into read-only mappings and lists into tuples"""
+    if isinstance(value, dict):
+        return MappingProxyType({k: _freeze(v) for k, v in value.items()})
+    if isinstance(value, list):
+        return tuple(_freeze(v) for v in value)
+    return value
+
+
+_compile_rule_patterns(KERNEL_API_RULES)
+_compile_rule_patterns(SECURITY_PATTERNS)
+
+# Read-only from here on, so consumers can share them without defensive copies
+TEST_CONFIGURATIONS = _freeze(TEST_CONFIGURATIONS)
+KERNEL_API_RULES = _freeze(KERNEL_API_RULES)
+SECURITY_PATTERNS = _freeze(SECURITY_PATTERNS)
+
+
 def load_config(config_path: str = "evaluation_config.json") -> EvaluationConfig:
     """Load configuration from file or create default"""
     return EvaluationConfig.load_from_file(config_path)
@@ -1,20 +1,58 @@
 import os
 import requests
+import hashlib
 import json
+import tempfile
 import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import List, Dict, Tuple
+from string import Template
+from typing import List, Dict, Optional, Tuple
 import argparse
 from scoring_analytics_engine import ScoringEngine, EvaluationResult
+from json_utils import dump_json, loads
 
 
 class OllamaInterface:
-    def __init__(self, base_url: str = "http://10.145.25.39:11434"):
+    def __init__(self, base_url: str = "http://10.145.25.39:11434", cache_dir: Optional[Path] = None):
         ollama_host = os.getenv('OLLAMA_HOST', 'localhost')
         self.base_url = f"http://{ollama_host}:11434"
+        # Responses keyed by (model, system prompt, prompt); None disables caching
+        self.cache_dir = cache_dir
+        # Keep-alive connections, enough for the concurrent comprehensive sweep
+        self._session = requests.Session()
+        self._session.mount("http://", requests.adapters.HTTPAdapter(pool_maxsize=16))
+
+    def _cache_key(self, model: str, system_prompt: Optional[str], prompt: str) -> str:
+        return hashlib.blake2b(json.dumps([model, system_prompt, prompt]).encode(), digest_size=20).hexdigest()
+
+    def _cache_get(self, key: str) -> Optional[str]:
+        try:
+            with open(self.cache_dir / f"{key}.json", "r") as f:
+                return json.load(f)["response"]
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def _cache_put(self, key: str, text: str):
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+            with os.fdopen(fd, "w") as f:
+                json.dump({"response": text}, f)
+            os.replace(tmp_path, self.cache_dir / f"{key}.json")
+        except OSError:
+            pass
 
     def generate_driver_code(self, prompt: str, model: str = "qwen2.5:latest", 
                            system_prompt: str = None) -> str:
+        cache_key = None
+        if self.cache_dir is not None:
+            cache_key = self._cache_key(model, system_prompt, prompt)
+            cached = self._cache_get(cache_key)
+            if cached is not None:
+                return cached
+        
         url = f"{self.base_url}/api/chat"
         messages = []
         
@@ -30,18 +68,22 @@ class OllamaInterface:
         
         buffer = []
         try:
-            with requests.post(url, json=payload, stream=True) as response:
+            with self._session.post(url, json=payload, stream=True) as response:
                 response.raise_for_status()
                 for line in response.iter_lines():
-                    if line:
-                        data = line.decode("utf-8")
-                        chunk = json.loads(data)
-                        content = chunk.get("message", {}).get("content")
-                        if content:
-                            buffer.append(content)
-            return "".join(buffer)
+                    if not line:
+                        continue
+                    # Parsed from bytes; orjson when installed
+                    message = loads(line).get("message")
+                    if message and (content := message.get("content")):
+                        buffer.append(content)
         except requests.RequestException as e:
             return f"Error communicating with Ollama: {e}"
+        
+        text = "".join(buffer)
+        if cache_key is not None and text:
+            self._cache_put(cache_key, text)
+        return text
 
 
 class PromptGenerator:
@@ -49,10 +91,10 @@ class PromptGenerator:
         self.base_prompts = {
             "character_device": """
 Create a simple character device driver that supports basic read/write operations with a
-{buffer_size} internal buffer. Include proper module initialization and cleanup functions.
+$buffer_size internal buffer. Include proper module initialization and cleanup functions.
 """,
             "block_device": """
-Create a basic block device driver that handles read/write requests with a {block_size} block size.
+Create a basic block device driver that handles read/write requests with a $block_size block size.
 Include request queue handling and proper error management.
 """,
             "network_device": """
@@ -82,32 +124,47 @@ Use the latest Linux kernel version APIs.
 Include proper error handling and resource cleanup.
 Do not include any explanations or comments outside the code.
 """
+        # Every (driver type, complexity) prompt, assembled once
+        self._templates = {
+            (driver_type, complexity): Template(f"{base_prompt}\n{modifier}\n{self.style_requirements}")
+            for driver_type, base_prompt in self.base_prompts.items()
+            for complexity, modifier in self.complexity_modifiers.items()
+        }
 
     def generate_prompt(self, driver_type: str, complexity: str = "basic", **kwargs) -> str:
         if driver_type not in self.base_prompts:
             raise ValueError(f"Unknown driver type: {driver_type}")
         
-        base_prompt = self.base_prompts[driver_type].format(**kwargs)
-        complexity_mod = self.complexity_modifiers.get(complexity, "")
-        
-        return f"{base_prompt}\n{complexity_mod}\n{self.style_requirements}"
+        template = self._templates.get((driver_type, complexity))
+        if template is None:
+            # Unknown complexity levels get no modifier
+            template = Template(f"{self.base_prompts[driver_type]}\n\n{self.style_requirements}")
+        return template.safe_substitute(kwargs)
 
 
 class TestSuiteRunner:
-    def __init__(self, models: List[str], output_dir: str = "evaluation_results"):
+    def __init__(self, models: List[str], output_dir: str = "evaluation_results", use_cache: bool = True):
         self.models = models
         self.output_dir = Path(output_dir)
         self.output_dir.mkdir(exist_ok=True)
-        self.ollama = OllamaInterface()
+        # Plain string form for building per-test file names
+        self._out = os.fspath(self.output_dir)
+        self.ollama = OllamaInterface(cache_dir=self.output_dir / ".prompt_cache" if use_cache else None)
         self.prompt_gen = PromptGenerator()
         self.scoring_engine = ScoringEngine()
+        # Standards text per file, read once and shared by every evaluation
+        self._kernel_standards = {}
         
     def load_kernel_standards(self, standards_file: str = "kernel_standards.txt") -> str:
-        try:
-            with open(standards_file, "r") as f:
-                return f.read()
-        except FileNotFoundError:
-            return self._get_default_kernel_standards()
+        standards = self._kernel_standards.get(standards_file)
+        if standards is None:
+            try:
+                with open(standards_file, "r") as f:
+                    standards = f.read()
+            except FileNotFoundError:
+                standards = self._get_default_kernel_standards()
+            self._kernel_standards[standards_file] = standards
+        return standards
     
     def _get_default_kernel_standards(self) -> str:
         return """
@@ -137,65 +194,111 @@ You are an expert Linux kernel developer. Follow these guidelines:
         
         generated_code = self.ollama.generate_driver_code(prompt, model, kernel_standards)
         
-        code_file = self.output_dir / f"{test_id}_generated.c"
-        with open(code_file, "w") as f:
-            f.write(generated_code)
+        code_file = os.path.join(self._out, f"{test_id}_generated.c")
+        with open(code_file, "wb") as f:
+            f.write(generated_code.encode())
         
-        result = self.scoring_engine.evaluate_driver_code(str(code_file))
+        result = self.scoring_engine.evaluate_driver_code(code_file, code=generated_code)
         
-        result_file = self.output_dir / f"{test_id}_results.json"
-        self.scoring_engine.export_results(result, str(result_file))
+        result_file = os.path.join(self._out, f"{test_id}_results.json")
+        self.scoring_engine.export_results(result, result_file)
         
-        print(f"  Overall Score: {result.overall_score:.2f}")
-        print(f"  Compilation: {'PASS' if result.compilation.success else 'FAIL'}")
-        print(f"  Security Score: {(result.security.buffer_safety_score + result.security.input_validation_score) / 2:.2f}")
+        # One print naming the test, so concurrent evaluations cannot split or mislabel it
+        print(f"Finished {model} on {driver_type} driver ({complexity}):\n"
+              f"  Overall Score: {result.overall_score:.2f}\n"
+              f"  Compilation: {'PASS' if result.compilation.success else 'FAIL'}\n"
+              f"  Security Score: {(result.security.buffer_safety_score + result.security.input_validation_score) / 2:.2f}")
         
         return test_id, result
 
-    def run_comprehensive_evaluation(self) -> Dict[str, List[Tuple[str, EvaluationResult]]]:
+    def run_comprehensive_evaluation(self, max_workers: int = 4, per_model_limit: int = 2,
+                                     throttle: float = 0.0) -> Dict[str, List[Tuple[str, EvaluationResult]]]:
         driver_types = ["character_device", "block_device", "network_device"]
         complexity_levels = ["basic", "intermediate"]
         
+        if per_model_limit < 1:
+            raise ValueError("per_model_limit must be at least 1")
+        
+        tests = [(driver_type, complexity)
+                 for driver_type in driver_types
+                 for complexity in complexity_levels]
+        
+        # Tests spend their time waiting on Ollama and make, so they overlap on
+        # the pool. Each model gets per_model_limit lanes pulling from its own
+        # queue, so a worker never sits blocked on one model's limit while
+        # another model's tests wait; lanes are interleaved across models.
+        pending = {model: deque(enumerate(tests)) for model in self.models}
+        outcomes = {model: [None] * len(tests) for model in self.models}
+        
+        def run_lane(model):
+            queue = pending[model]
+            while True:
+                try:
+                    index, (driver_type, complexity) = queue.popleft()
+                except IndexError:
+                    return
+                try:
+                    outcomes[model][index] = (True, self.run_single_evaluation(model, driver_type, complexity))
+                except Exception as e:
+                    outcomes[model][index] = (False, e)
+                # Optional pause before this lane starts the model's next test
+                if throttle > 0 and queue:
+                    time.sleep(throttle)
+        
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            lanes = [
+                executor.submit(run_lane, model)
+                for _ in range(min(per_model_limit, len(tests)))
+                for model in self.models
+            ]
+            for lane in lanes:
+                lane.result()
+        
         all_results = {}
         
         for model in self.models:
             model_results = []
-            print(f"\n=== Evaluating Model: {model} ===")
-            
-            for driver_type in driver_types:
-                for complexity in complexity_levels:
-                    try:
-                        test_id, result = self.run_single_evaluation(
-                            model, driver_type, complexity
-                        )
-                        model_results.append((test_id, result))
-                        time.sleep(1)
-                    except Exception as e:
-                        print(f"Error evaluating {model} on {driver_type}: {e}")
-                        
+            for (driver_type, _), (succeeded, value) in zip(tests, outcomes[model]):
+                if succeeded:
+                    model_results.append(value)
+                else:
+                    print(f"Error evaluating {model} on {driver_type}: {value}")
+                    
             all_results[model] = model_results
         
         return all_results
 
     def generate_comparison_report(self, all_results: Dict[str, List[Tuple[str, EvaluationResult]]]) -> Dict:
+        # Only the report needs numpy, so it is imported here rather than at startup
+        import numpy as np
+        
         model_summaries = []
+        score_statistics = {}
         
         for model, results in all_results.items():
             if not results:
                 continue
                 
-            scores = [r[1].overall_score for r in results]
-            compilation_success = [r[1].compilation.success for r in results]
+            scores = np.fromiter((r[1].overall_score for r in results), dtype=np.float64, count=len(results))
+            compilation_success = np.fromiter((r[1].compilation.success for r in results),
+                                              dtype=np.bool_, count=len(results))
             
             summary = {
                 'model': model,
-                'avg_score': sum(scores) / len(scores),
-                'max_score': max(scores),
-                'min_score': min(scores),
-                'compilation_success_rate': sum(compilation_success) / len(compilation_success),
+                'avg_score': float(scores.mean()),
+                'max_score': float(scores.max()),
+                'min_score': float(scores.min()),
+                'compilation_success_rate': float(compilation_success.mean()),
                 'total_tests': len(results)
             }
             model_summaries.append(summary)
+            
+            p50, p95 = np.percentile(scores, [50, 95])
+            score_statistics[model] = {
+                'std': float(scores.std()),
+                'p50': float(p50),
+                'p95': float(p95)
+            }
         
         model_summaries.sort(key=lambda x: x['avg_score'], reverse=True)
         
@@ -205,6 +308,7 @@ You are an expert Linux kernel developer. Follow these guidelines:
                 comparison_results.append((model, result))
         
         detailed_comparison = self.scoring_engine.compare_models(comparison_results)
+        detailed_comparison['statistical_analysis'] = score_statistics
         
         report = {
             'summary': model_summaries,
@@ -213,8 +317,7 @@ You are an expert Linux kernel developer. Follow these guidelines:
         }
         
         report_file = self.output_dir / "comparison_report.json"
-        with open(report_file, "w") as f:
-            json.dump(report, f, indent=2)
+        dump_json(report, report_file)
         
         return report
 
@@ -249,14 +352,25 @@ def main():
                        help="Output directory for results")
     parser.add_argument("--comprehensive", action="store_true", 
                        help="Run comprehensive evaluation across all driver types")
+    parser.add_argument("--no-cache", action="store_true",
+                       help="Always query Ollama instead of reusing cached responses")
+    parser.add_argument("--jobs", type=int, default=4,
+                       help="Evaluations to run concurrently in comprehensive mode")
+    parser.add_argument("--jobs-per-model", type=int, default=2,
+                       help="Concurrent evaluations allowed per model")
+    parser.add_argument("--throttle-seconds", type=float, default=0.0,
+                       help="Pause after each test before the model's next one starts")
     
     args = parser.parse_args()
+    if args.jobs_per_model < 1:
+        parser.error("--jobs-per-model must be at least 1")
     
-    runner = TestSuiteRunner(args.models, args.output_dir)
+    runner = TestSuiteRunner(args.models, args.output_dir, use_cache=not args.no_cache)
     
     if args.comprehensive:
         print("Running comprehensive evaluation...")
-        all_results = runner.run_comprehensive_evaluation()
+        all_results = runner.run_comprehensive_evaluation(args.jobs, args.jobs_per_model,
+                                                          args.throttle_seconds)
         report = runner.generate_comparison_report(all_results)
         runner.print_summary_report(report)
     elif args.driver_type:
@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+
+import json
+import re
+from dataclasses import asdict, is_dataclass
+from json.decoder import scanstring
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Both parsers accept bytes as well as str
+loads = orjson.loads if orjson is not None else json.loads
+
+# Escaped body of message.content in an Ollama chat chunk, without its quotes
+CONTENT_RE = re.compile(rb'"content"\s*:\s*"((?:[^"\\]|\\.)*)"')
+
+
+def unescape_json_string(body: bytes) -> str:
+    """Decode the escaped body of a JSON string; raises ValueError if malformed"""
+    return scanstring(body.decode("utf-8") + '"', 0)[0]
+
+
+def extract_chat_content(line: bytes):
+    """Pull message.content from one chunk, parsing the whole object only on a miss"""
+    match = CONTENT_RE.search(line)
+    if match:
+        return unescape_json_string(match.group(1))
+    return loads(line).get("message", {}).get("content")
+
+
+def _to_builtin(obj):
+    if is_dataclass(obj) and not isinstance(obj, type):
+        return asdict(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def dump_json(obj, path: str):
+    """Write dicts, lists and dataclasses to path as indented JSON.
+
+    orjson serializes dataclasses natively, so no asdict() copy of the
+    object graph is made when it is installed.
+    """
+    if orjson is not None:
+        with open(path, "wb") as f:
+            f.write(orjson.dumps(obj, option=orjson.OPT_INDENT_2))
+    else:
+        with open(path, "w") as f:
+            json.dump(obj, f, indent=2, default=_to_builtin)
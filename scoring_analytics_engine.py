@@ -1,12 +1,70 @@
-import json
+import atexit
+import math
 import re
+import shutil
 import subprocess
 import tempfile
 import os
-from dataclasses import dataclass, asdict
+import queue
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
 from typing import Dict, List, Tuple, Optional
-import numpy as np
 from pathlib import Path
+from json_utils import dump_json
+
+# Patterns used on every evaluation, compiled once
+_KMALLOC_ASSIGN_RE = re.compile(r'(\w+)\s*=\s*kmalloc\([^)]+\)')
+_KFREE_ARG_RE = re.compile(r'kfree\(([^)]+)\)')
+_SPIN_LOCK_ARG_RE = re.compile(r'spin_lock\(([^)]+)\)')
+_SPIN_UNLOCK_ARG_RE = re.compile(r'spin_unlock\(([^)]+)\)')
+_REQUEST_IRQ_RE = re.compile(r'request_irq\([^)]+\)')
+_FREE_IRQ_RE = re.compile(r'free_irq\([^)]+\)')
+# Every 'return'; the zero-width group is set when it returns a negative errno
+_RETURN_RE = re.compile(r'return(?=(\s+-\w+)|)')
+_WORD_RE = re.compile(r'\w+')
+# Halstead operators are single ASCII characters
+_OPERATOR_CHARS = "+-*/%=<>!&|^~?:;,(){}[]"
+# Decision points besides the && and || operators. scan() looks these up once per
+# distinct word in its token Counter, so no per-keyword pass over the source is needed
+_COMPLEXITY_KEYWORDS = frozenset(['if', 'else', 'elif', 'while', 'for', 'switch', 'case', 'default', 'catch'])
+
+# numpy is imported on first use so loading this module stays cheap
+_operator_counter = None
+
+
+def _get_operator_counter():
+    """Return a callable giving the count of each _OPERATOR_CHARS character in a string.
+
+    With numpy this is one byte histogram of the UTF-8 source; UTF-8 never uses
+    ASCII byte values inside multi-byte sequences, so byte and character counts
+    agree. Without numpy it falls back to str.count per operator.
+    """
+    global _operator_counter
+    if _operator_counter is None:
+        try:
+            import numpy as np
+        except ImportError:
+            _operator_counter = lambda code: [code.count(op) for op in _OPERATOR_CHARS]
+        else:
+            operator_bytes = np.frombuffer(_OPERATOR_CHARS.encode(), dtype=np.uint8)
+            _operator_counter = lambda code: np.bincount(
+                np.frombuffer(code.encode('utf-8'), dtype=np.uint8), minlength=256
+            )[operator_bytes].tolist()
+    return _operator_counter
+
+
+@dataclass
+class SourceScan:
+    decision_points: int
+    function_count: int
+    unique_operators: int
+    unique_operands: int
+    total_operators: int
+    total_operands: int
+    total_lines: int
+    lines_of_code: int
+    comment_lines: int
 
 
 @dataclass
@@ -75,8 +133,8 @@ class KernelRuleEngine:
             'style': 0.5
         }
 
-    def _load_api_patterns(self) -> Dict[str, List[str]]:
-        return {
+    def _load_api_patterns(self) -> Dict[str, List[re.Pattern]]:
+        patterns = {
             'memory_management': [
                 r'kmalloc\([^)]+\)',
                 r'kfree\([^)]+\)',
@@ -96,9 +154,10 @@ class KernelRuleEngine:
                 r'in_atomic\(\)'
             ]
         }
+        return {category: [re.compile(p) for p in group] for category, group in patterns.items()}
 
-    def _load_security_patterns(self) -> Dict[str, List[str]]:
-        return {
+    def _load_security_patterns(self) -> Dict[str, List[re.Pattern]]:
+        patterns = {
             'buffer_overflow': [
                 r'strcpy\s*\(',
                 r'strcat\s*\(',
@@ -114,6 +173,7 @@ class KernelRuleEngine:
                 r'atomic_(?!read|set)[a-zA-Z_]+\s*\('
             ]
         }
+        return {category: [re.compile(p) for p in group] for category, group in patterns.items()}
 
     def analyze_api_compliance(self, code: str) -> float:
         total_apis = 0
@@ -121,13 +181,13 @@ class KernelRuleEngine:
         
         for category, patterns in self.api_patterns.items():
             for pattern in patterns:
-                matches = re.findall(pattern, code)
+                matches = pattern.findall(code)
                 total_apis += len(matches)
                 correct_usage += self._validate_api_usage(code, pattern, category)
         
         return correct_usage / max(total_apis, 1)
 
-    def _validate_api_usage(self, code: str, pattern: str, category: str) -> int:
+    def _validate_api_usage(self, code: str, pattern: re.Pattern, category: str) -> int:
         if category == 'memory_management':
             return self._validate_memory_usage(code, pattern)
         elif category == 'locking':
@@ -136,21 +196,21 @@ class KernelRuleEngine:
             return self._validate_interrupt_usage(code, pattern)
         return 0
 
-    def _validate_memory_usage(self, code: str, pattern: str) -> int:
-        if 'kmalloc' in pattern:
-            matches = re.findall(r'(\w+)\s*=\s*kmalloc\([^)]+\)', code)
-            frees = re.findall(r'kfree\(([^)]+)\)', code)
+    def _validate_memory_usage(self, code: str, pattern: re.Pattern) -> int:
+        if 'kmalloc' in pattern.pattern:
+            matches = _KMALLOC_ASSIGN_RE.findall(code)
+            frees = _KFREE_ARG_RE.findall(code)
             return len([m for m in matches if m in frees])
         return 0
 
-    def _validate_locking_usage(self, code: str, pattern: str) -> int:
-        locks = re.findall(r'spin_lock\(([^)]+)\)', code)
-        unlocks = re.findall(r'spin_unlock\(([^)]+)\)', code)
+    def _validate_locking_usage(self, code: str, pattern: re.Pattern) -> int:
+        locks = _SPIN_LOCK_ARG_RE.findall(code)
+        unlocks = _SPIN_UNLOCK_ARG_RE.findall(code)
         return min(len(locks), len(unlocks))
 
-    def _validate_interrupt_usage(self, code: str, pattern: str) -> int:
-        requests = re.findall(r'request_irq\([^)]+\)', code)
-        frees = re.findall(r'free_irq\([^)]+\)', code)
+    def _validate_interrupt_usage(self, code: str, pattern: re.Pattern) -> int:
+        requests = _REQUEST_IRQ_RE.findall(code)
+        frees = _FREE_IRQ_RE.findall(code)
         return min(len(requests), len(frees))
 
     def analyze_security_risks(self, code: str) -> Dict[str, float]:
@@ -159,7 +219,7 @@ class KernelRuleEngine:
         for risk_type, patterns in self.security_patterns.items():
             risk_score = 0.0
             for pattern in patterns:
-                matches = len(re.findall(pattern, code))
+                matches = len(pattern.findall(code))
                 risk_score += matches * self.violation_weights['major']
             
             total_lines = len(code.splitlines())
@@ -169,8 +229,59 @@ class KernelRuleEngine:
 
 
 class StaticAnalyzer:
+    FUNCTION_HEADER = re.compile(r'\b[a-zA-Z_][a-zA-Z0-9_]*\s*\([^)]*\)\s*\{')
+
     def __init__(self):
         self.rule_engine = KernelRuleEngine()
+        # (code, SourceScan) of the last file scanned; replaced as one tuple so
+        # threads sharing the analyzer never pair a scan with the wrong code
+        self._last_scan = None
+
+    def scan(self, code: str) -> SourceScan:
+        """Token and line counts behind the complexity, Halstead and comment metrics.
+
+        Computed once per source and reused by every metric asked about the
+        same string. Operands are whole word runs that are ASCII identifiers.
+        """
+        last = self._last_scan
+        if last is not None and last[0] is code:
+            return last[1]
+
+        operator_counts = _get_operator_counter()(code)
+        unique_operators = sum(1 for count in operator_counts if count)
+        total_operators = sum(operator_counts)
+
+        decision_points = code.count('&&') + code.count('||')
+        unique_operands = total_operands = 0
+        for token, count in Counter(_WORD_RE.findall(code)).items():
+            if token in _COMPLEXITY_KEYWORDS:
+                decision_points += count
+            if token.isascii() and not token[0].isdigit():
+                unique_operands += 1
+                total_operands += count
+
+        lines = code.splitlines()
+        lines_of_code = comment_lines = 0
+        for line in lines:
+            stripped = line.strip()
+            if stripped and not stripped.startswith('//'):
+                lines_of_code += 1
+            if stripped.startswith('//') or '/*' in line or '*' in line:
+                comment_lines += 1
+
+        result = SourceScan(
+            decision_points=decision_points,
+            function_count=sum(1 for _ in self.FUNCTION_HEADER.finditer(code)),
+            unique_operators=unique_operators,
+            unique_operands=unique_operands,
+            total_operators=total_operators,
+            total_operands=total_operands,
+            total_lines=len(lines),
+            lines_of_code=lines_of_code,
+            comment_lines=comment_lines
+        )
+        self._last_scan = (code, result)
+        return result
 
     def run_sparse_analysis(self, code_path: str) -> int:
         try:
@@ -182,22 +293,32 @@ class StaticAnalyzer:
             return 0
 
     def run_checkpatch_analysis(self, code_path: str) -> int:
+        return self.run_checkpatch_batch([code_path])[code_path]
+
+    def run_checkpatch_batch(self, code_paths: List[str]) -> Dict[str, int]:
+        """Count ERROR/WARNING lines per file from a single checkpatch.pl process"""
+        violations = {path: 0 for path in code_paths}
         checkpatch_path = Path("checkpatch.pl")
-        if not checkpatch_path.exists():
-            return 0
+        if not checkpatch_path.exists() or not code_paths:
+            return violations
         
         try:
             result = subprocess.run([
-                'perl', str(checkpatch_path), '--no-tree', '--file', code_path
-            ], capture_output=True, text=True, timeout=30)
-            
-            violations = 0
-            for line in result.stdout.splitlines():
-                if 'ERROR:' in line or 'WARNING:' in line:
-                    violations += 1
-            return violations
+                'perl', str(checkpatch_path), '--no-tree', '--terse', '--file', *code_paths
+            ], capture_output=True, text=True, timeout=30 * len(code_paths))
         except:
-            return 0
+            return violations
+        
+        # Terse lines are "FILE:LINE: TYPE: message"; match longer paths first
+        by_length = sorted(code_paths, key=len, reverse=True)
+        for line in result.stdout.splitlines():
+            if 'ERROR:' not in line and 'WARNING:' not in line:
+                continue
+            for path in by_length:
+                if line.startswith(f"{path}:"):
+                    violations[path] += 1
+                    break
+        return violations
 
     def run_cppcheck_analysis(self, code_path: str) -> int:
         try:
@@ -209,92 +330,130 @@ class StaticAnalyzer:
             return 0
 
     def analyze_cyclomatic_complexity(self, code: str) -> float:
-        complexity_keywords = [
-            'if', 'else', 'elif', 'while', 'for', 'switch', 
-            'case', 'default', 'catch', '&&', '||'
-        ]
-        
-        total_complexity = 1
-        for keyword in complexity_keywords:
-            total_complexity += len(re.findall(rf'\b{keyword}\b', code))
-        
-        function_count = len(re.findall(r'\b[a-zA-Z_][a-zA-Z0-9_]*\s*\([^)]*\)\s*{', code))
-        return total_complexity / max(function_count, 1)
+        scan = self.scan(code)
+        return (1 + scan.decision_points) / max(scan.function_count, 1)
+
+    def function_lengths(self, code: str) -> List[int]:
+        """Line counts of function bodies, from the header to the first column-0 '}'.
+
+        Linear replacement for matching r'<header>{[\s\S]*?\n}' over the
+        whole file: jump between '{' with str.find and, when a ')' closes
+        right before one, match the header from just after the previous ')'.
+        A header's parameter list holds no ')', so it cannot start earlier,
+        however long it is.
+        """
+        lengths = []
+        pos = consumed = 0
+        while (brace := code.find('{', pos)) != -1:
+            pos = brace + 1
+            close = brace - 1
+            while close >= consumed and code[close].isspace():
+                close -= 1
+            if close < consumed or code[close] != ')':
+                continue
+            start = max(code.rfind(')', consumed, close) + 1, consumed)
+            header = self.FUNCTION_HEADER.search(code, start, pos)
+            if header is None:
+                continue
+            end = code.find('\n}', brace)
+            if end == -1:
+                break
+            lengths.append(len(code[header.start():end + 2].splitlines()))
+            pos = consumed = end + 2
+        return lengths
 
     def calculate_maintainability_index(self, code: str) -> float:
-        lines = code.splitlines()
         halstead_volume = self._calculate_halstead_volume(code)
         cyclomatic_complexity = self.analyze_cyclomatic_complexity(code)
-        lines_of_code = len([l for l in lines if l.strip() and not l.strip().startswith('//')])
+        lines_of_code = self.scan(code).lines_of_code
         
         if lines_of_code == 0:
             return 0.0
         
-        mi = 171 - 5.2 * np.log(halstead_volume) - 0.23 * cyclomatic_complexity - 16.2 * np.log(lines_of_code)
+        mi = 171 - 5.2 * math.log(halstead_volume) - 0.23 * cyclomatic_complexity - 16.2 * math.log(lines_of_code)
         return max(0, min(100, mi)) / 100.0
 
     def _calculate_halstead_volume(self, code: str) -> float:
-        operators = re.findall(r'[+\-*/%=<>!&|^~?:;,(){}[\]]', code)
-        operands = re.findall(r'\b[a-zA-Z_][a-zA-Z0-9_]*\b', code)
-        
-        unique_operators = len(set(operators))
-        unique_operands = len(set(operands))
-        total_operators = len(operators)
-        total_operands = len(operands)
+        scan = self.scan(code)
         
-        if unique_operators == 0 or unique_operands == 0:
+        if scan.unique_operators == 0 or scan.unique_operands == 0:
             return 1.0
         
-        vocabulary = unique_operators + unique_operands
-        length = total_operators + total_operands
+        vocabulary = scan.unique_operators + scan.unique_operands
+        length = scan.total_operators + scan.total_operands
         
-        return length * np.log2(vocabulary) if vocabulary > 1 else 1.0
+        return length * math.log2(vocabulary) if vocabulary > 1 else 1.0
 
 
 class CompilationTester:
     def __init__(self):
         self.kernel_headers_path = "/lib/modules/$(shell uname -r)/build"
-
-    def test_compilation(self, code_path: str) -> CompilationMetrics:
-        with tempfile.TemporaryDirectory() as tmpdir:
-            makefile_content = f"""
+        self.jobs = os.cpu_count() or 1
+        # Regenerated drivers are often identical, so ccache turns rebuilds into cache hits
+        self.ccache_env = None
+        if shutil.which("ccache"):
+            self.ccache_env = dict(os.environ)
+            self.ccache_env.setdefault(
+                "CCACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "llm-kernel", "ccache")
+            )
+        # Build directories reused across compilations, with the Makefile written
+        # once; a queue so concurrent evaluations never build in the same one
+        self._workdirs = queue.SimpleQueue()
+
+    def _acquire_workdir(self) -> str:
+        """Take a pooled build directory, creating one with its Makefile if none is free"""
+        try:
+            return self._workdirs.get_nowait()
+        except queue.Empty:
+            pass
+        
+        cc_override = ' CC="ccache gcc"' if self.ccache_env is not None else ""
+        makefile_content = f"""
 obj-m += driver.o
 KDIR := {self.kernel_headers_path}
 
 all:
-\tmake -C $(KDIR) M=$(PWD) modules
+\t$(MAKE) -C $(KDIR) M=$(PWD){cc_override} modules
 
 clean:
 \tmake -C $(KDIR) M=$(PWD) clean
 """
-            makefile_path = os.path.join(tmpdir, "Makefile")
-            driver_path = os.path.join(tmpdir, "driver.c")
-            
-            with open(makefile_path, "w") as f:
-                f.write(makefile_content)
-            
-            with open(code_path, "r") as src, open(driver_path, "w") as dst:
-                dst.write(src.read())
+        workdir = tempfile.mkdtemp(prefix="kdrv-")
+        atexit.register(shutil.rmtree, workdir, ignore_errors=True)
+        with open(os.path.join(workdir, "Makefile"), "w") as f:
+            f.write(makefile_content)
+        return workdir
+
+    def test_compilation(self, code_path: str) -> CompilationMetrics:
+        workdir = self._acquire_workdir()
+        try:
+            # A fresh copy, so make always sees driver.c as newer than the
+            # objects left by the previous build in this directory
+            shutil.copyfile(code_path, os.path.join(workdir, "driver.c"))
             
             import time
             start_time = time.time()
             
             try:
                 result = subprocess.run(
-                    ["make"], cwd=tmpdir, capture_output=True, text=True, timeout=60
+                    ["make", f"-j{self.jobs}"], cwd=workdir, capture_output=True, text=True,
+                    timeout=60, env=self.ccache_env
                 )
                 build_time = time.time() - start_time
                 
-                error_count = len(re.findall(r'error:', result.stderr, re.IGNORECASE))
-                warning_count = len(re.findall(r'warning:', result.stderr, re.IGNORECASE))
+                stderr = result.stderr.lower()
+                error_count = stderr.count('error:')
+                warning_count = stderr.count('warning:')
                 
+                # A failed build may leave an earlier driver's module behind
+                success = result.returncode == 0
                 binary_size = None
-                ko_file = os.path.join(tmpdir, "driver.ko")
-                if os.path.exists(ko_file):
+                ko_file = os.path.join(workdir, "driver.ko")
+                if success and os.path.exists(ko_file):
                     binary_size = os.path.getsize(ko_file)
                 
                 return CompilationMetrics(
-                    success=result.returncode == 0,
+                    success=success,
                     error_count=error_count,
                     warning_count=warning_count,
                     build_time=build_time,
@@ -307,6 +466,8 @@ clean:
                     warning_count=0,
                     build_time=60.0
                 )
+        finally:
+            self._workdirs.put(workdir)
 
 
 class ScoringEngine:
@@ -321,15 +482,23 @@ class ScoringEngine:
             'functionality': 0.05
         }
 
-    def evaluate_driver_code(self, code_path: str) -> EvaluationResult:
-        with open(code_path, 'r') as f:
-            code = f.read()
-
-        compilation_metrics = self._evaluate_compilation(code_path)
-        static_analysis_metrics = self._evaluate_static_analysis(code_path, code)
-        security_metrics = self._evaluate_security(code)
-        code_quality_metrics = self._evaluate_code_quality(code)
-        functionality_metrics = self._evaluate_functionality(code)
+    def evaluate_driver_code(self, code_path: str, *,
+                             checkpatch_violations: Optional[int] = None,
+                             code: Optional[str] = None) -> EvaluationResult:
+        # Callers that just wrote the file pass its contents to skip the re-read
+        if code is None:
+            with open(code_path, 'r') as f:
+                code = f.read()
+
+        # The module build is the slowest step; the analyzers and the
+        # in-process metrics all run while make does
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            compilation_future = executor.submit(self._evaluate_compilation, code_path)
+            static_analysis_metrics = self._evaluate_static_analysis(code_path, code, checkpatch_violations)
+            security_metrics = self._evaluate_security(code)
+            code_quality_metrics = self._evaluate_code_quality(code)
+            functionality_metrics = self._evaluate_functionality(code)
+            compilation_metrics = compilation_future.result()
 
         weighted_scores = self._calculate_weighted_scores(
             compilation_metrics, static_analysis_metrics, security_metrics,
@@ -351,11 +520,21 @@ class ScoringEngine:
     def _evaluate_compilation(self, code_path: str) -> CompilationMetrics:
         return self.compilation_tester.test_compilation(code_path)
 
-    def _evaluate_static_analysis(self, code_path: str, code: str) -> StaticAnalysisMetrics:
-        sparse_issues = self.static_analyzer.run_sparse_analysis(code_path)
-        checkpatch_violations = self.static_analyzer.run_checkpatch_analysis(code_path)
-        cppcheck_issues = self.static_analyzer.run_cppcheck_analysis(code_path)
-        api_compliance = self.static_analyzer.rule_engine.analyze_api_compliance(code)
+    def _evaluate_static_analysis(self, code_path: str, code: str,
+                                  checkpatch_violations: Optional[int] = None) -> StaticAnalysisMetrics:
+        # The three tools are separate processes, so their runs overlap
+        with ThreadPoolExecutor(max_workers=3) as executor:
+            sparse_future = executor.submit(self.static_analyzer.run_sparse_analysis, code_path)
+            checkpatch_future = None
+            if checkpatch_violations is None:
+                checkpatch_future = executor.submit(self.static_analyzer.run_checkpatch_analysis, code_path)
+            cppcheck_future = executor.submit(self.static_analyzer.run_cppcheck_analysis, code_path)
+            api_compliance = self.static_analyzer.rule_engine.analyze_api_compliance(code)
+
+            sparse_issues = sparse_future.result()
+            if checkpatch_future is not None:
+                checkpatch_violations = checkpatch_future.result()
+            cppcheck_issues = cppcheck_future.result()
 
         return StaticAnalysisMetrics(
             sparse_issues=sparse_issues,
@@ -377,13 +556,11 @@ class ScoringEngine:
         )
 
     def _evaluate_code_quality(self, code: str) -> CodeQualityMetrics:
-        lines = code.splitlines()
-        total_lines = len(lines)
-        comment_lines = len([l for l in lines if l.strip().startswith('//') or '/*' in l or '*' in l])
-        comment_ratio = comment_lines / max(total_lines, 1)
+        scan = self.static_analyzer.scan(code)
+        comment_ratio = scan.comment_lines / max(scan.total_lines, 1)
 
-        functions = re.findall(r'\b[a-zA-Z_][a-zA-Z0-9_]*\s*\([^)]*\)\s*{[\s\S]*?\n}', code)
-        avg_func_length = np.mean([len(f.splitlines()) for f in functions]) if functions else 0
+        function_lengths = self.static_analyzer.function_lengths(code)
+        avg_func_length = sum(function_lengths) / len(function_lengths) if function_lengths else 0
 
         cyclomatic_complexity = self.static_analyzer.analyze_cyclomatic_complexity(code)
         maintainability_index = self.static_analyzer.calculate_maintainability_index(code)
@@ -397,13 +574,14 @@ class ScoringEngine:
         )
 
     def _evaluate_functionality(self, code: str) -> FunctionalityMetrics:
-        has_read = 'read' in code and 'file_operations' in code
-        has_write = 'write' in code and 'file_operations' in code
-        has_open = 'open' in code
-        has_release = 'release' in code
+        has = {keyword: keyword in code for keyword in ('read', 'write', 'open', 'release', 'file_operations')}
+        has_read = has['read'] and has['file_operations']
+        has_write = has['write'] and has['file_operations']
 
-        basic_ops_score = sum([has_read, has_write, has_open, has_release]) / 4.0
-        error_handling_score = len(re.findall(r'return\s+-\w+', code)) / max(len(re.findall(r'return', code)), 1)
+        basic_ops_score = sum([has_read, has_write, has['open'], has['release']]) / 4.0
+        returns = _RETURN_RE.findall(code)
+        error_returns = sum(1 for errno in returns if errno)
+        error_handling_score = error_returns / max(len(returns), 1)
 
         return FunctionalityMetrics(
             basic_operations_score=basic_ops_score,
@@ -428,8 +606,7 @@ class ScoringEngine:
         }
 
     def export_results(self, result: EvaluationResult, output_path: str):
-        with open(output_path, 'w') as f:
-            json.dump(asdict(result), f, indent=2)
+        dump_json(result, output_path)
 
     def compare_models(self, results: List[Tuple[str, EvaluationResult]]) -> Dict[str, any]:
         comparison = {
@@ -438,6 +615,10 @@ class ScoringEngine:
             'statistical_analysis': {}
         }
 
+        categories = ['compilation', 'static_analysis', 'security', 'code_quality', 'functionality']
+        # (score, model) per category; a model has to beat zero to win
+        best = {category: (0, None) for category in categories}
+
         for model_name, result in results:
             comparison['model_rankings'].append({
                 'model': model_name,
@@ -445,18 +626,12 @@ class ScoringEngine:
                 'compilation_success': result.compilation.success,
                 'security_score': (result.security.buffer_safety_score + result.security.input_validation_score) / 2.0
             })
+            for category in categories:
+                score = result.weighted_scores.get(category, 0)
+                if score > best[category][0]:
+                    best[category] = (score, model_name)
 
         comparison['model_rankings'].sort(key=lambda x: x['overall_score'], reverse=True)
-
-        categories = ['compilation', 'static_analysis', 'security', 'code_quality', 'functionality']
-        for category in categories:
-            best_score = 0
-            best_model = None
-            for model_name, result in results:
-                score = result.weighted_scores.get(category, 0)
-                if score > best_score:
-                    best_score = score
-                    best_model = model_name
-            comparison['category_winners'][category] = best_model
+        comparison['category_winners'] = {category: model for category, (_, model) in best.items()}
 
         return comparison
\ No newline at end of file
@@ -1,65 +1,91 @@
 #!/usr/bin/env python3
 
-import json
+import hashlib
+import os
+import re
 import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import List, Dict, Tuple
-from enhanced_evaluation import ask_ollama_stream, load_kernel_standards, generate_test_prompts
+from typing import List, Dict, Optional, Tuple
+from enhanced_evaluation import (ask_ollama_stream, load_kernel_standards, generate_test_prompts,
+                                 _model_file_suffix)
 from scoring_analytics_engine import ScoringEngine
+from json_utils import dump_json
+
+
+def _write_text(path: str, text: str):
+    """Write text to path as one bytes write"""
+    with open(path, "wb") as f:
+        f.write(text.encode())
+
+
+# Built once per process; shared by every loop and the CLI choices
+_PROMPTS_BY_NAME = generate_test_prompts()
 
 
 class FeedbackGenerator:
+    # Every snippet _analyze_specific_issues looks for, matched in one pass
+    SPECIFIC_ISSUE_PROBES = re.compile(
+        r"single_open|single_release|kfree\(buffer\)|static char buffer|class_unregister|return result;"
+    )
+    
     def __init__(self):
         self.scoring_engine = ScoringEngine()
     
     def generate_detailed_feedback(self, code: str, evaluation_result, iteration: int) -> str:
-        feedback = f"ITERATION {iteration} - CODE REVIEW FEEDBACK\n\nOVERALL SCORE: {evaluation_result.overall_score:.2f}/1.00\n\nCRITICAL ISSUES TO FIX:\n\n"
+        parts = [f"ITERATION {iteration} - CODE REVIEW FEEDBACK\n\nOVERALL SCORE: {evaluation_result.overall_score:.2f}/1.00\n\nCRITICAL ISSUES TO FIX:\n\n"]
         
         if not evaluation_result.compilation.success:
-            feedback += "COMPILATION FAILED:\nYour code does not compile. This is the highest priority issue.\n\n (```c```) encapsulation is not needed. \n\nCommon kernel driver compilation issues:\n- Wrong function signatures in file_operations\n- Missing or incorrect #include statements\n- Using undefined functions or variables\n- API misuse (mixing different kernel subsystems)\n- Syntax errors or typos\n\n"
+            parts.append("COMPILATION FAILED:\nYour code does not compile. This is the highest priority issue.\n\n (```c```) encapsulation is not needed. \n\nCommon kernel driver compilation issues:\n- Wrong function signatures in file_operations\n- Missing or incorrect #include statements\n- Using undefined functions or variables\n- API misuse (mixing different kernel subsystems)\n- Syntax errors or typos\n\n")
         
         if evaluation_result.static_analysis.sparse_issues > 0:
-            feedback += f"STATIC ANALYSIS ISSUES ({evaluation_result.static_analysis.sparse_issues} Sparse issues):\n- Check for type mismatches\n- Verify pointer usage\n- Fix endianness issues\n- Address context violations (atomic vs non-atomic)\n\n"
+            parts.append(f"STATIC ANALYSIS ISSUES ({evaluation_result.static_analysis.sparse_issues} Sparse issues):\n- Check for type mismatches\n- Verify pointer usage\n- Fix endianness issues\n- Address context violations (atomic vs non-atomic)\n\n")
         
         if evaluation_result.static_analysis.checkpatch_violations > 10:
-            feedback += f"CODING STYLE VIOLATIONS ({evaluation_result.static_analysis.checkpatch_violations} violations):\n- Use proper Linux kernel coding style\n- Place opening braces correctly (functions: next line, others: same line)\n- Follow 80-column limit\n- Add SPDX license header: // SPDX-License-Identifier: GPL-2.0\n- Don't initialize static variables to NULL\n\n"
+            parts.append(f"CODING STYLE VIOLATIONS ({evaluation_result.static_analysis.checkpatch_violations} violations):\n- Use proper Linux kernel coding style\n- Place opening braces correctly (functions: next line, others: same line)\n- Follow 80-column limit\n- Add SPDX license header: // SPDX-License-Identifier: GPL-2.0\n- Don't initialize static variables to NULL\n\n")
         
         if evaluation_result.static_analysis.api_compliance_score < 0.5:
-            feedback += "API USAGE ERRORS:\n- Ensure all kmalloc() calls are paired with kfree()\n- Don't call kfree() on statically allocated buffers\n- Match all register_chrdev() with unregister_chrdev()\n- Match all class_create() with class_destroy()\n- Use correct function signatures for file_operations\n\n"
+            parts.append("API USAGE ERRORS:\n- Ensure all kmalloc() calls are paired with kfree()\n- Don't call kfree() on statically allocated buffers\n- Match all register_chrdev() with unregister_chrdev()\n- Match all class_create() with class_destroy()\n- Use correct function signatures for file_operations\n\n")
         
         security_score = (evaluation_result.security.buffer_safety_score + evaluation_result.security.input_validation_score) / 2
         if security_score < 0.8:
-            feedback += "SECURITY CONCERNS:\n- Validate user input sizes before copying\n- Use copy_from_user() and copy_to_user() correctly\n- Check buffer boundaries\n- Handle edge cases in read/write operations\n\n"
+            parts.append("SECURITY CONCERNS:\n- Validate user input sizes before copying\n- Use copy_from_user() and copy_to_user() correctly\n- Check buffer boundaries\n- Handle edge cases in read/write operations\n\n")
         
         if evaluation_result.functionality.basic_operations_score < 1.0:
-            feedback += "FUNCTIONALITY ISSUES:\n- Implement proper open/release functions for character devices\n- Don't mix seq_file APIs with character device APIs\n- Use simple return 0 for open, not single_open()\n- Implement proper file position handling\n\n"
+            parts.append("FUNCTIONALITY ISSUES:\n- Implement proper open/release functions for character devices\n- Don't mix seq_file APIs with character device APIs\n- Use simple return 0 for open, not single_open()\n- Implement proper file position handling\n\n")
         
         if evaluation_result.functionality.error_handling_score < 0.5:
-            feedback += "ERROR HANDLING:\n- Check return values of all kernel API calls\n- Use proper error codes (-ENOMEM, -EFAULT, -EINVAL)\n- Implement proper cleanup in error paths\n- Don't return uninitialized variables\n\n"
+            parts.append("ERROR HANDLING:\n- Check return values of all kernel API calls\n- Use proper error codes (-ENOMEM, -EFAULT, -EINVAL)\n- Implement proper cleanup in error paths\n- Don't return uninitialized variables\n\n")
         
-        feedback += self._analyze_specific_issues(code)
+        parts.append(self._analyze_specific_issues(code))
         
-        feedback += "\nFOCUS AREAS FOR NEXT ITERATION:\n1. Fix compilation errors first\n2. Use correct file_operations function signatures\n3. Follow kernel coding style guidelines\n4. Implement proper error handling\n5. Use appropriate kernel APIs for character devices\n\nREMEMBER:\n- Character devices use simple file operations, not seq_file\n- Static buffers don't need kfree()\n- Always check API return values\n- Follow Linux kernel coding style exactly"
+        parts.append("\nFOCUS AREAS FOR NEXT ITERATION:\n1. Fix compilation errors first\n2. Use correct file_operations function signatures\n3. Follow kernel coding style guidelines\n4. Implement proper error handling\n5. Use appropriate kernel APIs for character devices\n\nREMEMBER:\n- Character devices use simple file operations, not seq_file\n- Static buffers don't need kfree()\n- Always check API return values\n- Follow Linux kernel coding style exactly")
         
-        return feedback
+        return "".join(parts)
     
     def _analyze_specific_issues(self, code: str) -> str:
         issues = []
+        found = {}
+        for match in self.SPECIFIC_ISSUE_PROBES.finditer(code):
+            found.setdefault(match.group(), match.start())
         
-        if "single_open" in code:
+        if "single_open" in found:
             issues.append("- Remove single_open() - use simple return 0 for character device open()")
         
-        if "single_release" in code:
+        if "single_release" in found:
             issues.append("- Remove single_release - use simple return 0 for character device release()")
         
-        if "kfree(buffer)" in code and "static char buffer" in code:
+        if "kfree(buffer)" in found and "static char buffer" in found:
             issues.append("- Don't call kfree() on static buffers - only on kmalloc'd memory")
         
-        if "class_unregister" in code:
+        if "class_unregister" in found:
             issues.append("- class_unregister() doesn't exist - use only class_destroy()")
         
-        if "return result;" in code and "result" not in code.split("return result;")[0].split("\n")[-1]:
-            issues.append("- Don't return uninitialized variables - check your return statements")
+        if "return result;" in found:
+            # Only the first occurrence counts: flag it unless its own line mentions result earlier
+            start = found["return result;"]
+            if "result" not in code[code.rfind("\n", 0, start) + 1:start]:
+                issues.append("- Don't return uninitialized variables - check your return statements")
         
         if issues:
             return f"\nSPECIFIC ISSUES FOUND IN YOUR CODE:\n" + "\n".join(issues) + "\n"
@@ -68,61 +94,78 @@ class FeedbackGenerator:
 
 
 class IterativeTrainingLoop:
-    def __init__(self, model: str = "qwen2.5:latest", test_type: str = "simple_char_driver"):
+    def __init__(self, model: str = "qwen2.5:latest", test_type: str = "simple_char_driver",
+                 results_dir: str = "results"):
         self.model = model
         self.test_type = test_type
+        self.results_dir = results_dir
         self.feedback_generator = FeedbackGenerator()
         self.kernel_standards = load_kernel_standards()
-        self.test_prompts = generate_test_prompts()
-        self.test_config = next((t for t in self.test_prompts if t["name"] == test_type), self.test_prompts[0])
+        self.test_prompts = _PROMPTS_BY_NAME
+        self.test_config = self.test_prompts.get(test_type) or next(iter(self.test_prompts.values()))
+        # Evaluations keyed by a digest of the code, so a repeated generation is not rebuilt
+        self._eval_cache = {}
         
-        Path("results").mkdir(exist_ok=True)
+        Path(results_dir).mkdir(parents=True, exist_ok=True)
     
-    def run_training_loop(self, num_iterations: int = 5) -> List[Dict]:
+    def run_training_loop(self, num_iterations: int = 5, pace: float = 0.0) -> List[Dict]:
         results = []
         current_feedback = ""
+        pending_writes = []
         
-        for iteration in range(1, num_iterations + 1):
-            code = self._generate_code_with_feedback(iteration, current_feedback)
-            
-            code_file = f"results/iteration_{iteration}_{self.test_type}.c"
-            with open(code_file, "w") as f:
-                f.write(code)
-            
-            evaluation_result = self.feedback_generator.scoring_engine.evaluate_driver_code(code_file)
-            
-            result_file = f"results/iteration_{iteration}_results.json"
-            self.feedback_generator.scoring_engine.export_results(evaluation_result, result_file)
-            
-            if iteration < num_iterations:
-                current_feedback = self.feedback_generator.generate_detailed_feedback(
-                    code, evaluation_result, iteration
-                )
+        # Artifacts the next generation does not need are written while it streams
+        with ThreadPoolExecutor(max_workers=1) as writer:
+            for iteration in range(1, num_iterations + 1):
+                code_file = os.path.join(self.results_dir, f"iteration_{iteration}_{self.test_type}.c")
+                code = self._generate_code_with_feedback(iteration, current_feedback, code_file)
                 
-                feedback_file = f"results/iteration_{iteration}_feedback.txt"
-                with open(feedback_file, "w") as f:
-                    f.write(current_feedback)
-            
-            iteration_result = {
-                "iteration": iteration,
-                "overall_score": evaluation_result.overall_score,
-                "compilation_success": evaluation_result.compilation.success,
-                "static_analysis_score": evaluation_result.weighted_scores.get('static_analysis', 0),
-                "security_score": evaluation_result.weighted_scores.get('security', 0),
-                "code_quality_score": evaluation_result.weighted_scores.get('code_quality', 0),
-                "functionality_score": evaluation_result.weighted_scores.get('functionality', 0),
-                "code_file": code_file,
-                "result_file": result_file
-            }
+                code_digest = hashlib.blake2b(code.encode(), digest_size=20).digest()
+                evaluation_result = self._eval_cache.get(code_digest)
+                if evaluation_result is None:
+                    evaluation_result = self.feedback_generator.scoring_engine.evaluate_driver_code(
+                        code_file, code=code
+                    )
+                    self._eval_cache[code_digest] = evaluation_result
+                
+                result_file = os.path.join(self.results_dir, f"iteration_{iteration}_results.json")
+                pending_writes.append(writer.submit(
+                    self.feedback_generator.scoring_engine.export_results, evaluation_result, result_file
+                ))
+                
+                if iteration < num_iterations:
+                    current_feedback = self.feedback_generator.generate_detailed_feedback(
+                        code, evaluation_result, iteration
+                    )
+                
+                    feedback_file = os.path.join(self.results_dir, f"iteration_{iteration}_feedback.txt")
+                    pending_writes.append(writer.submit(_write_text, feedback_file, current_feedback))
+                
+                iteration_result = {
+                    "iteration": iteration,
+                    "overall_score": evaluation_result.overall_score,
+                    "compilation_success": evaluation_result.compilation.success,
+                    "static_analysis_score": evaluation_result.weighted_scores.get('static_analysis', 0),
+                    "security_score": evaluation_result.weighted_scores.get('security', 0),
+                    "code_quality_score": evaluation_result.weighted_scores.get('code_quality', 0),
+                    "functionality_score": evaluation_result.weighted_scores.get('functionality', 0),
+                    "code_file": code_file,
+                    "result_file": result_file
+                }
+                
+                results.append(iteration_result)
+                self._print_iteration_summary(iteration_result)
+                if pace > 0 and iteration < num_iterations:
+                    time.sleep(pace)
             
-            results.append(iteration_result)
-            self._print_iteration_summary(iteration_result)
-            time.sleep(1)
+            for future in pending_writes:
+                future.result()
         
         self._generate_final_report(results)
         return results
     
-    def _generate_code_with_feedback(self, iteration: int, feedback: str) -> str:
+    def _generate_code_with_feedback(self, iteration: int, feedback: str,
+                                     code_file: Optional[str] = None) -> str:
+        """Generate the next attempt, streaming it into code_file as it arrives"""
         if iteration == 1:
             prompt = self.test_config["prompt"]
         else:
@@ -140,43 +183,53 @@ Pay special attention to:
 
 Return only the corrected C code, no explanations."""
         
-        return ask_ollama_stream(prompt, self.model, self.kernel_standards)
+        return ask_ollama_stream(prompt, self.model, self.kernel_standards, out_path=code_file)
     
     def _print_iteration_summary(self, result: Dict):
         compile_status = "PASS" if result['compilation_success'] else "FAIL"
-        print(f"Iteration {result['iteration']}: Score {result['overall_score']:.3f}, Compile {compile_status}")
+        print(f"[{self.model}/{self.test_type}] Iteration {result['iteration']}: Score {result['overall_score']:.3f}, Compile {compile_status}")
     
     def _generate_final_report(self, results: List[Dict]):
-        print(f"\n{'Iter':<4} {'Score':<6} {'Compile':<8} {'Static':<8} {'Security':<8} {'Quality':<8} {'Function':<8}")
-        print("-" * 60)
-        
-        for result in results:
-            compile_status = "PASS" if result['compilation_success'] else "FAIL"
-            print(f"{result['iteration']:<4} "
-                  f"{result['overall_score']:<6.3f} "
-                  f"{compile_status:<8} "
-                  f"{result['static_analysis_score']:<8.3f} "
-                  f"{result['security_score']:<8.3f} "
-                  f"{result['code_quality_score']:<8.3f} "
-                  f"{result['functionality_score']:<8.3f}")
+        rows = [f"\n[{self.model}/{self.test_type}] TRAINING REPORT",
+                f"{'Iter':<4} {'Score':<6} {'Compile':<8} {'Static':<8} {'Security':<8} {'Quality':<8} {'Function':<8}",
+                "-" * 60]
+        first_compile = None
+        best_iteration = results[0]
+        
+        # One pass builds the table and finds the first compile and the (earliest) best score
+        for i, result in enumerate(results):
+            if result['compilation_success']:
+                compile_status = "PASS"
+                if first_compile is None:
+                    first_compile = i
+            else:
+                compile_status = "FAIL"
+            if result['overall_score'] > best_iteration['overall_score']:
+                best_iteration = result
+            rows.append(f"{result['iteration']:<4} "
+                        f"{result['overall_score']:<6.3f} "
+                        f"{compile_status:<8} "
+                        f"{result['static_analysis_score']:<8.3f} "
+                        f"{result['security_score']:<8.3f} "
+                        f"{result['code_quality_score']:<8.3f} "
+                        f"{result['functionality_score']:<8.3f}")
         
         first_score = results[0]['overall_score']
         last_score = results[-1]['overall_score']
         improvement = last_score - first_score
         
-        print(f"\nInitial Score: {first_score:.3f}")
-        print(f"Final Score: {last_score:.3f}")
-        print(f"Improvement: {improvement:+.3f}")
+        rows.append(f"\nInitial Score: {first_score:.3f}")
+        rows.append(f"Final Score: {last_score:.3f}")
+        rows.append(f"Improvement: {improvement:+.3f}")
         
-        compilation_progress = [r['compilation_success'] for r in results]
-        first_compile = next((i for i, success in enumerate(compilation_progress) if success), None)
         if first_compile is not None:
-            print(f"First successful compilation: Iteration {first_compile + 1}")
+            rows.append(f"First successful compilation: Iteration {first_compile + 1}")
         else:
-            print("No successful compilations achieved")
+            rows.append("No successful compilations achieved")
         
-        best_iteration = max(results, key=lambda x: x['overall_score'])
-        print(f"Best iteration: {best_iteration['iteration']} (Score: {best_iteration['overall_score']:.3f})")
+        rows.append(f"Best iteration: {best_iteration['iteration']} (Score: {best_iteration['overall_score']:.3f})")
+        # One print per report, so reports from concurrent loops do not interleave
+        print("\n".join(rows))
         
         summary = {
             "model": self.model,
@@ -187,24 +240,69 @@ Return only the corrected C code, no explanations."""
             "best_iteration": best_iteration['iteration']
         }
         
-        with open("results/training_summary.json", "w") as f:
-            json.dump(summary, f, indent=2)
+        dump_json(summary, os.path.join(self.results_dir, "training_summary.json"))
+
+
+def run_training_loops(configs: List[Tuple[str, str]], num_iterations: int = 5,
+                       max_workers: Optional[int] = None,
+                       pace: float = 0.0) -> Dict[Tuple[str, str], List[Dict]]:
+    """
+    Run independent (model, test_type) training loops concurrently.
+
+    Iterations within a loop stay sequential since each prompt carries the
+    previous feedback; separate loops only share the Ollama server, which
+    serves up to OLLAMA_NUM_PARALLEL requests at once. Each loop writes to
+    its own results/<test_type>_<model> directory.
+    """
+    def run_one(model, test_type):
+        results_dir = os.path.join("results", f"{test_type}{_model_file_suffix(model)}")
+        trainer = IterativeTrainingLoop(model, test_type, results_dir)
+        return trainer.run_training_loop(num_iterations, pace)
+
+    # A repeated config would race its twin on the same results directory
+    configs = list(dict.fromkeys(configs))
+    all_results = {}
+    with ThreadPoolExecutor(max_workers=max_workers or len(configs)) as executor:
+        futures = {config: executor.submit(run_one, *config) for config in configs}
+        for (model, test_type), future in futures.items():
+            try:
+                all_results[(model, test_type)] = future.result()
+            except Exception as e:
+                print(f"Error training {model} on {test_type}: {e}")
+    return all_results
 
 
 def main():
     import argparse
     
     parser = argparse.ArgumentParser(description="Iterative Training Loop for AI Code Generation")
-    parser.add_argument("--model", default="qwen2.5:latest", help="Model to train")
+    parser.add_argument("--model", nargs="+", default=["qwen2.5:latest"],
+                       help="Model(s) to train; several models train concurrently")
+    test_choices = list(_PROMPTS_BY_NAME)
     parser.add_argument("--test", default="simple_char_driver", 
-                       choices=["simple_char_driver", "gpio_platform_driver", "proc_interface_driver"],
+                       choices=test_choices,
                        help="Test type")
+    parser.add_argument("--tests", type=lambda value: value.split(","), default=None,
+                       help="Comma-separated test types to train concurrently (overrides --test)")
     parser.add_argument("--iterations", type=int, default=5, help="Number of iterations")
+    parser.add_argument("--jobs", type=int, default=None,
+                       help="Training loops to run at once (default: one per model and test)")
+    parser.add_argument("--pace", type=float, default=0.0,
+                       help="Seconds to pause between iterations (default: none)")
     
     args = parser.parse_args()
     
-    trainer = IterativeTrainingLoop(args.model, args.test)
-    trainer.run_training_loop(args.iterations)
+    tests = args.tests or [args.test]
+    unknown = [test for test in tests if test not in test_choices]
+    if unknown:
+        parser.error(f"unknown test type(s): {', '.join(unknown)} (choose from {', '.join(test_choices)})")
+    
+    configs = list(dict.fromkeys((model, test) for model in args.model for test in tests))
+    if len(configs) == 1:
+        trainer = IterativeTrainingLoop(*configs[0])
+        trainer.run_training_loop(args.iterations, args.pace)
+    else:
+        run_training_loops(configs, args.iterations, args.jobs, args.pace)
 
 
 if __name__ == "__main__":
@@ -1,5 +1,10 @@
+import json
+
 import requests
 
+from json_utils import CONTENT_RE, loads as _loads, unescape_json_string
+
+_SESSION = requests.Session()
 
 def ask_ollama_stream(query, model="qwen2.5:latest", system_prompt=None):
     url = "http://192.168.1.2:11434/api/chat"
@@ -12,21 +17,28 @@ def ask_ollama_stream(query, model="qwen2.5:latest", system_prompt=None):
         "messages": messages,
         "stream": True
     }
-    buffer = []
+    # Escaped JSON string bodies concatenate into one valid body, unescaped once at the end
+    buffer = bytearray()
     try:
-        with requests.post(url, json=payload, stream=True) as response:
+        with _SESSION.post(url, json=payload, stream=True) as response:
             response.raise_for_status()
-            for line in response.iter_lines():
+            # Chunked reads return as soon as data arrives, so a large size only batches bursts.
+            # Lines stay bytes: CONTENT_RE and _loads both work on them directly.
+            for line in response.iter_lines(chunk_size=64 * 1024, decode_unicode=False):
                 if line:
-                    data = line.decode("utf-8")
-                    import json
-                    chunk = json.loads(data)
-                    content = chunk.get("message", {}).get("content")
+                    match = CONTENT_RE.search(line)
+                    if match:
+                        buffer += match.group(1)
+                        continue
+                    content = _loads(line).get("message", {}).get("content")
                     if content:
-                        buffer.append(content)
-        return "".join(buffer)
+                        buffer += json.dumps(content)[1:-1].encode("ascii")
+        return unescape_json_string(buffer)
     except requests.RequestException as e:
         return f"Error communicating with Ollama: {e}"
+    except ValueError as e:
+        # A malformed chunk or escape sequence; JSONDecodeError is a ValueError
+        return f"Error decoding Ollama response: {e}"
 
 
 with open("kernel_standards.txt", "r") as f: